@@ -7,8 +7,123 @@ import logging
 import os
 import re
 import sys
+from collections.abc import Iterable, Iterator, Mapping
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Optional
 
+# first run of digits and dots, i.e. the semantic version part of a version string
+_SEMVER_RE = re.compile(r"([\.\d]+)")
+_FULL_SEMVER_RE = re.compile(r"\d+\.\d+\.\d+")
+# any of the ecosystem packages with the rest of the line, longest names first
+_LIB_ALT_RE = re.compile(r"\b(torchvision|torchtext|torchaudio|torch)(?![-_\w]).*")
+
+# line separator and buffer large enough for a whole requirements file to be read and written in one system call
+_NL = os.linesep
+_IO_BUFFER_SIZE = 1 << 16
+
+# releases which do not follow the generic pairing rule, keyed by torch version
+_TA_EXCEPTIONS = MappingProxyType({
+    "2.0.1": "2.0.2",
+    "2.0.0": "2.0.1",
+    "1.8.2": "0.9.1",
+})
+_TT_EXCEPTIONS = MappingProxyType({
+    "2.0.1": "0.15.2",
+    "2.0.0": "0.15.1",
+    "1.8.2": "0.9.1",
+})
+_TV_EXCEPTIONS = MappingProxyType({
+    "2.0.1": "0.15.2",
+    "2.0.0": "0.15.1",
+    "1.10.2": "0.11.3",
+    "1.10.1": "0.11.2",
+    "1.10.0": "0.11.1",
+    "1.8.2": "0.9.1",
+})
+
+
+def _extract_semver(ver: str) -> str:
+    """Extract the leading run of digits and dots, falling back to regex search for other prefixes.
+
+    >>> _extract_semver("2.4.1")
+    '2.4.1'
+    >>> _extract_semver("2.4.1+cu121")
+    '2.4.1'
+    >>> _extract_semver("v1.9.0")
+    '1.9.0'
+    >>> _extract_semver("2.1\u00b2")
+    '2.1'
+
+    """
+    # `isdecimal` matches exactly what `\d` does, unlike `isdigit` which also accepts e.g. superscripts
+    if not ver[:1].isdecimal():
+        return _SEMVER_RE.search(ver).group(1)
+    if ver.replace(".", "").isdecimal():
+        # already clean version, nothing to drop
+        return ver
+    i, n = 0, len(ver)
+    while i < n and (ver[i].isdecimal() or ver[i] == "."):
+        i += 1
+    return ver[:i]
+
+
+def _split3(ver: str) -> tuple[int, int, int]:
+    """Parse the major, minor and bugfix parts of a clean three-part version.
+
+    >>> _split3("2.10.1")
+    (2, 10, 1)
+
+    """
+    i = ver.find(".")
+    j = ver.find(".", i + 1)
+    return int(ver[:i]), int(ver[i + 1 : j]), int(ver[j + 1 :])
+
+
+def _pair_torchaudio(torch_ver: str, ver_parts: tuple[int, int, int]) -> str:
+    """Determine the torchaudio version from the already parsed torch version."""
+    if torch_ver in _TA_EXCEPTIONS:
+        return _TA_EXCEPTIONS[torch_ver]
+    ver_major, ver_minor, ver_bugfix = ver_parts
+    if ver_major == 1:
+        return f"0.{ver_minor}.{ver_bugfix}"
+    return f"{ver_major}.{ver_minor}.{ver_bugfix}"
+
+
+def _pair_torchtext(torch_ver: str, ver_parts: tuple[int, int, int]) -> str:
+    """Determine the torchtext version from the already parsed torch version."""
+    if torch_ver in _TT_EXCEPTIONS:
+        return _TT_EXCEPTIONS[torch_ver]
+    ver_major, ver_minor, ver_bugfix = ver_parts
+    if ver_major == 1:
+        return f"0.{ver_minor + 1}.{ver_bugfix}"
+    if ver_major == 2:
+        if ver_minor >= 3:
+            return "0.18.0"
+        return f"0.{ver_minor + 15}.{ver_bugfix}"
+    raise ValueError(f"Invalid torch version: {torch_ver}")
+
+
+def _pair_torchvision(torch_ver: str, ver_parts: tuple[int, int, int]) -> str:
+    """Determine the torchvision version from the already parsed torch version."""
+    if torch_ver in _TV_EXCEPTIONS:
+        return _TV_EXCEPTIONS[torch_ver]
+    ver_major, ver_minor, ver_bugfix = ver_parts
+    if ver_major == 1:
+        return f"0.{ver_minor + 1}.{ver_bugfix}"
+    if ver_major == 2:
+        return f"0.{ver_minor + 15}.{ver_bugfix}"
+    raise ValueError(f"Invalid torch version: {torch_ver}")
+
+
+def _pair_ecosystem(torch_ver: str, ver_parts: tuple[int, int, int]) -> tuple[str, str, str]:
+    """Determine the torchvision, torchtext and torchaudio versions for the parsed torch version."""
+    return (
+        _pair_torchvision(torch_ver, ver_parts),
+        _pair_torchtext(torch_ver, ver_parts),
+        _pair_torchaudio(torch_ver, ver_parts),
+    )
+
 
 def _determine_torchaudio(torch_version: str) -> str:
     """Determine the torchaudio version based on the torch version.
@@ -21,19 +136,7 @@ def _determine_torchaudio(torch_version: str) -> str:
     '0.9.1'
 
     """
-    _version_exceptions = {
-        "2.0.1": "2.0.2",
-        "2.0.0": "2.0.1",
-        "1.8.2": "0.9.1",
-    }
-    if torch_version in _version_exceptions:
-        return _version_exceptions[torch_version]
-    ver_major, ver_minor, ver_bugfix = map(int, torch_version.split("."))
-    ta_ver_array = [ver_major, ver_minor, ver_bugfix]
-    if ver_major == 1:
-        ta_ver_array[0] = 0
-    ta_ver_array[2] = ver_bugfix
-    return ".".join(map(str, ta_ver_array))
+    return _pair_torchaudio(torch_version, _split3(torch_version))
 
 
 def _determine_torchtext(torch_version: str) -> str:
@@ -47,27 +150,7 @@ def _determine_torchtext(torch_version: str) -> str:
     '0.9.1'
 
     """
-    _version_exceptions = {
-        "2.0.1": "0.15.2",
-        "2.0.0": "0.15.1",
-        "1.8.2": "0.9.1",
-    }
-    if torch_version in _version_exceptions:
-        return _version_exceptions[torch_version]
-    ver_major, ver_minor, ver_bugfix = map(int, torch_version.split("."))
-    tt_ver_array = [0, 0, 0]
-    if ver_major == 1:
-        tt_ver_array[1] = ver_minor + 1
-        tt_ver_array[2] = ver_bugfix
-    elif ver_major == 2:
-        if ver_minor >= 3:
-            tt_ver_array[1] = 18
-        else:
-            tt_ver_array[1] = ver_minor + 15
-            tt_ver_array[2] = ver_bugfix
-    else:
-        raise ValueError(f"Invalid torch version: {torch_version}")
-    return ".".join(map(str, tt_ver_array))
+    return _pair_torchtext(torch_version, _split3(torch_version))
 
 
 def _determine_torchvision(torch_version: str) -> str:
@@ -81,38 +164,22 @@ def _determine_torchvision(torch_version: str) -> str:
     '0.15.2'
 
     """
-    _version_exceptions = {
-        "2.0.1": "0.15.2",
-        "2.0.0": "0.15.1",
-        "1.10.2": "0.11.3",
-        "1.10.1": "0.11.2",
-        "1.10.0": "0.11.1",
-        "1.8.2": "0.9.1",
-    }
-    if torch_version in _version_exceptions:
-        return _version_exceptions[torch_version]
-    ver_major, ver_minor, ver_bugfix = map(int, torch_version.split("."))
-    tv_ver_array = [0, 0, 0]
-    if ver_major == 1:
-        tv_ver_array[1] = ver_minor + 1
-    elif ver_major == 2:
-        tv_ver_array[1] = ver_minor + 15
-    else:
-        raise ValueError(f"Invalid torch version: {torch_version}")
-    tv_ver_array[2] = ver_bugfix
-    return ".".join(map(str, tv_ver_array))
+    return _pair_torchvision(torch_version, _split3(torch_version))
 
 
-def find_latest(ver: str) -> dict[str, str]:
+@lru_cache(maxsize=64)
+def find_latest(ver: str) -> Mapping[str, str]:
     """Find the latest version.
 
+    The result is cached per version string, so it is returned as a read-only mapping.
+
     >>> from pprint import pprint
-    >>> pprint(find_latest("2.4.1"))
+    >>> pprint(dict(find_latest("2.4.1")))
     {'torch': '2.4.1',
      'torchaudio': '2.4.1',
      'torchtext': '0.18.0',
      'torchvision': '0.19.1'}
-    >>> pprint(find_latest("2.1"))
+    >>> pprint(dict(find_latest("2.1")))
     {'torch': '2.1.0',
      'torchaudio': '2.1.0',
      'torchtext': '0.16.0',
@@ -120,31 +187,23 @@ def find_latest(ver: str) -> dict[str, str]:
 
     """
     # drop all except semantic version
-    ver = re.search(r"([\.\d]+)", ver).groups()[0]
+    ver = _extract_semver(ver)
     # in case there remaining dot at the end - e.g "1.9.0.dev20210504"
     ver = ver[:-1] if ver[-1] == "." else ver
-    if not re.match(r"\d+\.\d+\.\d+", ver):
+    if not _FULL_SEMVER_RE.match(ver):
         ver += ".0"  # add missing bugfix
     logging.debug(f"finding ecosystem versions for: {ver}")
 
     # find first match
-    return {
-        "torch": ver,
-        "torchvision": _determine_torchvision(ver),
-        "torchtext": _determine_torchtext(ver),
-        "torchaudio": _determine_torchaudio(ver),
-    }
+    tv_ver, tt_ver, ta_ver = _pair_ecosystem(ver, _split3(ver))
+    return MappingProxyType({"torch": ver, "torchvision": tv_ver, "torchtext": tt_ver, "torchaudio": ta_ver})
 
 
-def adjust(requires: list[str], pytorch_version: Optional[str] = None) -> list[str]:
-    """Adjust the versions to be paired within pytorch ecosystem.
+def adjust_iter(requires: Iterable[str], pytorch_version: Optional[str] = None) -> Iterator[str]:
+    """Lazily adjust the versions to be paired within pytorch ecosystem, one requirement line at a time.
 
-    >>> from pprint import pprint
-    >>> pprint(adjust(["torch>=1.9.0", "torchvision>=0.10.0", "torchtext>=0.10.0", "torchaudio>=0.9.0"], "2.1.0"))
-    ['torch==2.1.0',
-     'torchvision==0.16.0',
-     'torchtext==0.16.0',
-     'torchaudio==2.1.0']
+    >>> list(adjust_iter(["torchvision>=0.10.0  # comment", "numpy"], "2.1.0"))
+    ['torchvision==0.16.0  # comment', 'numpy']
 
     """
     if not pytorch_version:
@@ -154,52 +213,73 @@ def adjust(requires: list[str], pytorch_version: Optional[str] = None) -> list[s
     if not pytorch_version:
         raise ValueError(f"invalid torch: {pytorch_version}")
 
-    requires_ = []
     options = find_latest(pytorch_version)
-    logging.debug(f"determined ecosystem alignment: {options}")
+    logging.debug(f"determined ecosystem alignment: {dict(options)}")
+
+    def _pin(match: re.Match) -> str:
+        lib = match.group(1)
+        return f"{lib}=={options[lib]}" if options.get(lib) else ""
+
     for req in requires:
-        req_split = req.strip().split("#", maxsplit=1)
-        # anything before fst # shall be requirements
-        req = req_split[0].strip()
-        # anything after # in the line is comment
-        comment = "" if len(req_split) < 2 else "  #" + req_split[1]
+        # anything before fst # shall be requirements, anything after # in the line is comment
+        req, sep, comment = req.partition("#")
+        req = req.strip()
+        comment = "  #" + comment if sep else ""
         if not req:
             # if only comment make it short
-            requires_.append(comment.strip())
+            yield comment.strip()
             continue
-        for lib, version in options.items():
-            replace = f"{lib}=={version}" if version else ""
-            req = re.sub(rf"\b{lib}(?![-_\w]).*", replace, req)
-        requires_.append(req + comment.rstrip())
+        # all ecosystem packages share the `torch` prefix, so skip the regex for unrelated lines
+        if "torch" in req:
+            req = _LIB_ALT_RE.sub(_pin, req)
+        yield req + comment.rstrip()
 
-    return requires_
+
+def adjust(requires: Iterable[str], pytorch_version: Optional[str] = None) -> list[str]:
+    """Adjust the versions to be paired within pytorch ecosystem.
+
+    >>> from pprint import pprint
+    >>> pprint(adjust(["torch>=1.9.0", "torchvision>=0.10.0", "torchtext>=0.10.0", "torchaudio>=0.9.0"], "2.1.0"))
+    ['torch==2.1.0',
+     'torchvision==0.16.0',
+     'torchtext==0.16.0',
+     'torchaudio==2.1.0']
+
+    """
+    return list(adjust_iter(requires, pytorch_version))
 
 
 def _offset_print(reqs: list[str], offset: str = "\t|\t") -> str:
     """Adding offset to each line for the printing requirements."""
-    reqs = [offset + r for r in reqs]
-    return os.linesep.join(reqs)
+    return _NL.join(offset + r for r in reqs)
 
 
 def main(requirements_path: str, torch_version: Optional[str] = None) -> None:
     """The main entry point with mapping to the CLI for positional arguments only."""
     # rU - universal line ending - https://stackoverflow.com/a/2717154/4521646
-    with open(requirements_path, encoding="utf8") as fopen:
-        requirements = fopen.readlines()
-    requirements = adjust(requirements, torch_version)
+    with open(requirements_path, encoding="utf8", buffering=_IO_BUFFER_SIZE) as fopen:
+        # stream lines from the file handle, only the adjusted output is kept for logging and writing
+        requirements = adjust(fopen, torch_version)
     logging.info(
         f"requirements_path='{requirements_path}' with arg torch_version='{torch_version}' >>\n"
         f"{_offset_print(requirements)}"
     )
-    with open(requirements_path, "w", encoding="utf8") as fopen:
-        fopen.writelines([r + os.linesep for r in requirements])
+    with open(requirements_path, "w", encoding="utf8", buffering=_IO_BUFFER_SIZE) as fopen:
+        # write the whole file as a single buffer
+        if requirements:
+            fopen.write(_NL.join(requirements) + _NL)
 
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
-    try:
-        from fire import Fire
+    cli_args = sys.argv[1:]
+    if cli_args and not any(arg.startswith("-") for arg in cli_args):
+        # plain positional arguments do not need Fire, so skip its import cost
+        main(*cli_args)
+    else:
+        try:
+            from fire import Fire
 
-        Fire(main)
-    except (ModuleNotFoundError, ImportError):
-        main(*sys.argv[1:])
+            Fire(main)
+        except (ModuleNotFoundError, ImportError):
+            main(*cli_args)
@@ -3,6 +3,8 @@ import platform
 import subprocess
 import sys
 
+import pytest
+
 from scripts import _PATH_SCRIPTS
 
 REQUIREMENTS_SAMPLE = """
@@ -29,14 +31,29 @@ deepspeed >=0.8.2, <=0.9.3; platform_system != "Windows"  # strict
 """
 
 
-def test_adjust_torch_versions_call(tmp_path) -> None:
+@pytest.mark.parametrize(
+    "torch_args",
+    [
+        pytest.param(["1.10.0"], id="positional"),
+        pytest.param(["--torch_version=1.10.0"], id="flag"),
+    ],
+)
+def test_adjust_torch_versions_call(tmp_path, torch_args) -> None:
     path_script = os.path.join(_PATH_SCRIPTS, "adjust-torch-versions.py")
     path_req_file = str(tmp_path / "requirements.txt")
     with open(path_req_file, "w", encoding="utf8") as fopen:
         fopen.write(REQUIREMENTS_SAMPLE)
 
-    return_code = subprocess.call([sys.executable, path_script, path_req_file, "1.10.0"])  # noqa: S603
-    assert return_code == 0
+    if any(arg.startswith("-") for arg in torch_args):
+        # flags are parsed only by Fire, without it the raw flag would be passed on as the version
+        pytest.importorskip("fire")
+
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, path_script, path_req_file, *torch_args], capture_output=True, text=True
+    )
+    assert result.returncode == 0
+    # the version has to reach `main` as a parsed value, not as the raw CLI argument
+    assert "with arg torch_version='1.10.0'" in result.stderr
 
     with open(path_req_file, encoding="utf8") as fopen:
         req_result = fopen.read()